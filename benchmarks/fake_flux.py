@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+"""
+A scriptable fake `flux` executable (and scheduler) for the benchmarks and tests.
+It answers the flux commands used by server.py and database.py with synthetic data.
+
+Submitted jobs are kept in FAKE_FLUX_STATE with their --dependency arguments.
+A job with dependencies starts in DEPEND and moves to SCHED once they are satisfied,
+or fails if an afterok parent did not complete. set_job_state() moves jobs between states.
+
+Configured through environment variables:
+    FAKE_FLUX_NODES        number of nodes in the instance (default 4)
+    FAKE_FLUX_JOBS         number of jobs listed by `flux jobs -a` (default 100)
+    FAKE_FLUX_LATENCY      seconds to sleep on every invocation (default 0)
+    FAKE_FLUX_OUTPUT_SIZE  bytes written by `flux job attach` (default 1024)
+    FAKE_FLUX_STATE        directory that keeps the jobs submitted with `flux submit`
+    FAKE_FLUX_CWD          working directory reported for the synthetic jobs
+    FAKE_FLUX_FAIL_SUBMIT  comma separated job names for which `flux submit` fails
+    FAKE_FLUX_LIST_LIMIT   number of most recent jobs listed by `flux jobs` without job IDs (default 1000)
+
+Every invocation appends its own peak RSS (in KB) to FAKE_FLUX_STATE/rss.log.
+"""
+import os
+import sys
+import json
+import time
+import fcntl
+import resource
+
+NODES = int(os.environ.get("FAKE_FLUX_NODES", 4))
+JOBS = int(os.environ.get("FAKE_FLUX_JOBS", 100))
+LATENCY = float(os.environ.get("FAKE_FLUX_LATENCY", 0))
+OUTPUT_SIZE = int(os.environ.get("FAKE_FLUX_OUTPUT_SIZE", 1024))
+LIST_LIMIT = int(os.environ.get("FAKE_FLUX_LIST_LIMIT", 1000))
+FAIL_SUBMIT = [name for name in os.environ.get("FAKE_FLUX_FAIL_SUBMIT", "").split(",") if name]
+STATE = os.environ.get("FAKE_FLUX_STATE", "/tmp/fake_flux")
+CWD = os.environ.get("FAKE_FLUX_CWD", "/tmp")
+
+# Synthetic jobs use ids starting at this value, submitted jobs use the following ids in order
+JOB_ID_BASE = 676292747853824
+
+# Example workflow (DAG) used by the benchmarks and the tests
+WORKFLOW = {
+    "workflowName": "pipeline",
+    "dirName": "pipeline",
+    "steps": [
+        {"name": "prepare", "jobCommand": "echo prepare"},
+        {"name": "compute-1", "jobCommand": "echo compute", "afterok": ["prepare"]},
+        {"name": "compute-2", "jobCommand": "echo compute", "afterok": ["prepare"]},
+        {"name": "cleanup", "jobCommand": "echo cleanup", "afterany": ["compute-1", "compute-2"]}
+    ]
+}
+
+def hostnames():
+    return [f"node{i}" for i in range(NODES)]
+
+def synthetic_job(index):
+    return {
+        "id": JOB_ID_BASE + index,
+        "userid": 0,
+        "urgency": 16,
+        "priority": 16,
+        "t_submit": 1667760398.4034982 + index,
+        "t_depend": 1667760398.4034982 + index,
+        "state": "INACTIVE",
+        "result": "COMPLETED",
+        "name": f"job-{index}",
+        "cwd": CWD,
+        "ntasks": 1,
+        "ncores": 1,
+        "duration": 0.0
+    }
+
+def install(bindir):
+    """
+    Write a `flux` wrapper running this script into bindir, to be put on the PATH.
+    """
+    path = os.path.join(bindir, "flux")
+    with open(path, "w") as f:
+        f.write(f"#!/bin/sh\nexec \"{sys.executable}\" \"{os.path.abspath(__file__)}\" \"$@\"\n")
+    os.chmod(path, 0o755)
+    return path
+
+def job_path(state, job_id):
+    return os.path.join(state, "jobs", f"{job_id}.json")
+
+def read_job(state, job_id):
+    with open(job_path(state, job_id)) as f:
+        return json.load(f)
+
+def write_job(state, job):
+    os.makedirs(os.path.join(state, "jobs"), exist_ok=True)
+    with open(job_path(state, job["id"]), "w") as f:
+        json.dump(job, f)
+
+def set_job_state(state, job_id, job_state, result=None):
+    """
+    Move a submitted job to another state, e.g. RUN or INACTIVE with a result.
+    """
+    job = read_job(state, job_id)
+    job["state"] = job_state
+    job.pop("result", None)
+    if result is not None:
+        job["result"] = result
+    write_job(state, job)
+
+def resolve_dependencies(state, jobs):
+    """
+    Move DEPEND jobs to SCHED once their dependencies are satisfied,
+    or to INACTIVE/FAILED if an afterok parent did not complete.
+    """
+    by_id = {job["id"]: job for job in jobs}
+    changed = True
+    while changed:
+        changed = False
+        for job in jobs:
+            if job["state"] != "DEPEND":
+                continue
+
+            satisfied = True
+            for dependency in job.get("dependencies", []):
+                kind, parent_id = dependency.split(":", 1)
+                parent = by_id.get(int(parent_id))
+                if parent is None or parent["state"] != "INACTIVE":
+                    satisfied = False
+                elif kind == "afterok" and parent.get("result") != "COMPLETED":
+                    job["state"] = "INACTIVE"
+                    job["result"] = "FAILED"
+                    break
+
+            if job["state"] == "INACTIVE" or satisfied:
+                if job["state"] == "DEPEND":
+                    job["state"] = "SCHED"
+                write_job(state, job)
+                changed = True
+    return jobs
+
+def next_job_id():
+    """
+    Return the next submitted job id from a counter in the state directory.
+    """
+    os.makedirs(STATE, exist_ok=True)
+    with open(os.path.join(STATE, "counter"), "a+") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        f.seek(0)
+        count = int(f.read() or 0) + 1
+        f.seek(0)
+        f.truncate()
+        f.write(str(count))
+    return JOB_ID_BASE + JOBS + count
+
+def submitted_jobs():
+    jobs_dir = os.path.join(STATE, "jobs")
+    if not os.path.isdir(jobs_dir):
+        return []
+
+    jobs = []
+    for file in os.listdir(jobs_dir):
+        with open(os.path.join(jobs_dir, file)) as f:
+            jobs.append(json.load(f))
+    return resolve_dependencies(STATE, jobs)
+
+def submit(args):
+    name = "job"
+    cwd = CWD
+    dependencies = []
+    for arg in args:
+        if arg.startswith("--job-name="):
+            name = arg.split("=", 1)[1]
+        elif arg.startswith("--cwd="):
+            cwd = arg.split("=", 1)[1]
+        elif arg.startswith("--dependency="):
+            dependencies.append(arg.split("=", 1)[1])
+
+    if name in FAIL_SUBMIT:
+        sys.stderr.write(f"flux-submit: {name}: submission rejected\n")
+        return 1
+
+    job_id = next_job_id()
+    job = dict(synthetic_job(0), id=job_id, name=name, cwd=cwd, t_submit=time.time())
+    job.pop("result")
+    job["state"] = "DEPEND" if dependencies else "SCHED"
+    job["dependencies"] = dependencies
+    write_job(STATE, job)
+
+    # Keep the order of submissions
+    with open(os.path.join(STATE, "submit.log"), "a") as f:
+        f.write(f"{name}\n")
+
+    print(f"ƒ{job_id}")
+    return 0
+
+def main(args):
+    if LATENCY:
+        time.sleep(LATENCY)
+
+    command = args[:2]
+
+    if args[:1] == ["hostlist"]:
+        print(" ".join(hostnames()))
+    elif command == ["resource", "list"]:
+        print("     STATE NNODES NCORES NGPUS NODELIST")
+        print(f"      free      1      4     1 {args[-1]}")
+    elif command == ["resource", "status"]:
+        print(f"avail     1 {args[-1]}")
+    elif command in (["resource", "drain"], ["resource", "undrain"]):
+        if args[-1] not in hostnames():
+            sys.stderr.write(f"flux-resource: {args[-1]}: unknown host\n")
+            return 1
+    elif args[:1] == ["jobs"]:
+        jobs = [synthetic_job(i) for i in range(JOBS)] + submitted_jobs()
+        job_ids = [int(arg) for arg in args[1:] if not arg.startswith("-")]
+        if job_ids:
+            jobs = [job for job in jobs if job["id"] in job_ids]
+        else:
+            jobs = sorted(jobs, key=lambda job: job["t_submit"], reverse=True)[:LIST_LIMIT]
+        print(json.dumps({"jobs": jobs}))
+    elif args[:1] == ["submit"]:
+        return submit(args[1:])
+    elif command == ["job", "id"]:
+        print(args[2].lstrip("ƒf"))
+    elif command == ["job", "attach"]:
+        sys.stdout.write("x" * OUTPUT_SIZE)
+    elif command == ["job", "cancel"]:
+        pass
+    elif command == ["overlay", "status"]:
+        print(f"0 {hostnames()[0]}: full")
+        for i, host in enumerate(hostnames()[1:], start=1):
+            print(f"├─ {i} {host}: full")
+    else:
+        sys.stderr.write(f"flux: unknown command: {' '.join(args)}\n")
+        return 1
+
+    return 0
+
+def report_rss():
+    os.makedirs(STATE, exist_ok=True)
+    with open(os.path.join(STATE, "rss.log"), "a") as f:
+        f.write(f"{resource.getrusage(resource.RUSAGE_SELF).ru_maxrss}\n")
+
+if __name__ == '__main__':
+    code = main(sys.argv[1:])
+    report_rss()
+    sys.exit(code)
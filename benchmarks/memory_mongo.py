@@ -0,0 +1,97 @@
+"""
+An in-memory stand-in for the pymongo database used by database.py.
+It implements only the collection operations the portal uses and counts every operation.
+"""
+import copy
+import threading
+from bson.objectid import ObjectId
+
+class MemoryDatabase:
+    """
+    A dict of MemoryCollection objects, used in place of pymongo's Database.
+    """
+    def __init__(self):
+        self.collections = {}
+        self.ops = 0
+        self.lock = threading.Lock()
+
+    def __getitem__(self, name):
+        with self.lock:
+            if name not in self.collections:
+                self.collections[name] = MemoryCollection(self)
+            return self.collections[name]
+
+    def count_op(self):
+        with self.lock:
+            self.ops += 1
+
+class MemoryCollection:
+    """
+    A list of documents, used in place of pymongo's Collection.
+    """
+    def __init__(self, database):
+        self.database = database
+        self.documents = []
+        self.lock = threading.Lock()
+
+    def create_index(self, keys):
+        self.database.count_op()
+
+    def insert_one(self, document):
+        self.database.count_op()
+        document.setdefault("_id", ObjectId())
+        with self.lock:
+            self.documents.append(copy.deepcopy(document))
+        return InsertOneResult(document["_id"])
+
+    def delete_many(self, query):
+        self.database.count_op()
+        with self.lock:
+            self.documents = [doc for doc in self.documents if not match(doc, query)]
+
+    def update_one(self, query, update, upsert=False):
+        self.database.count_op()
+        with self.lock:
+            for doc in self.documents:
+                if match(doc, query):
+                    doc.update(copy.deepcopy(update.get("$set", {})))
+                    return
+
+            if upsert:
+                doc = {k: v for k, v in query.items() if not isinstance(v, dict)}
+                doc.update(copy.deepcopy(update.get("$set", {})))
+                doc.setdefault("_id", ObjectId())
+                self.documents.append(doc)
+
+    def find(self, query, projection=None):
+        self.database.count_op()
+        with self.lock:
+            return [project(doc, projection) for doc in self.documents if match(doc, query)]
+
+    def find_one(self, query, projection=None):
+        self.database.count_op()
+        with self.lock:
+            for doc in self.documents:
+                if match(doc, query):
+                    return project(doc, projection)
+        return None
+
+class InsertOneResult:
+    def __init__(self, inserted_id):
+        self.inserted_id = inserted_id
+
+def match(doc, query):
+    """
+    Match a document against a query of equalities.
+    """
+    return all(key in doc and doc[key] == value for key, value in query.items())
+
+def project(doc, projection):
+    """
+    Apply an exclusion projection, e.g. {'_id': 0}, to a copy of the document.
+    """
+    doc = copy.deepcopy(doc)
+    if not projection:
+        return doc
+
+    return {key: value for key, value in doc.items() if projection.get(key, 1)}
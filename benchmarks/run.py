@@ -0,0 +1,341 @@
+"""
+Benchmark and load simulation for the Flux Web Portal.
+
+Drives every route of server.py through the Flask test client, then runs a concurrent
+HTTP load against a local server. The flux CLI is replaced by fake_flux.py and MongoDB
+by an in-memory stand-in, so the results only depend on the portal code.
+
+The fake flux state and the in-memory MongoDB are reset before every route, so the
+results of a route do not depend on the routes measured before it.
+
+Usage:
+    python benchmarks/run.py --nodes 16 --jobs 500 --iterations 20 --output bench_output.txt
+"""
+import os
+import sys
+import io
+import json
+import time
+import shutil
+import logging
+import argparse
+import resource
+import tempfile
+import threading
+import subprocess
+import urllib.error
+import urllib.request
+import concurrent.futures
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import server
+import database
+import fake_flux
+from werkzeug.serving import make_server
+from memory_mongo import MemoryDatabase
+
+#########################################
+# INSTRUMENTATION
+#########################################
+
+class ForkCounter:
+    """
+    Count the subprocesses spawned through subprocess.run.
+    """
+    def __init__(self):
+        self.forks = 0
+        self.lock = threading.Lock()
+        self.run = subprocess.run
+
+    def __call__(self, *args, **kwargs):
+        with self.lock:
+            self.forks += 1
+        return self.run(*args, **kwargs)
+
+def percentiles(samples):
+    """
+    Return the latency percentiles (in milliseconds) of a list of samples (in seconds).
+    Returns None if there are no samples.
+    """
+    if not samples:
+        return None
+
+    samples = sorted(samples)
+    def at(p):
+        return round(samples[min(len(samples) - 1, int(p / 100 * len(samples)))] * 1000, 3)
+
+    return {
+        "p50_ms": at(50),
+        "p90_ms": at(90),
+        "p99_ms": at(99),
+        "max_ms": round(samples[-1] * 1000, 3),
+        "mean_ms": round(sum(samples) / len(samples) * 1000, 3)
+    }
+
+def portalPeakRSS():
+    """
+    Return the peak resident set size (in KB) of the portal process so far.
+    """
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+def fluxPeakRSS():
+    """
+    Return the largest peak resident set size (in KB) reported by the fake flux
+    processes since the last reset, or None if flux was not called.
+    """
+    path = os.path.join(os.environ["FAKE_FLUX_STATE"], "rss.log")
+    if not os.path.exists(path):
+        return None
+
+    with open(path) as f:
+        return max(int(line) for line in f if line.strip())
+
+def summarize(samples, statuses, forks, ops, rssBefore):
+    """
+    Build the result of a series of requests.
+    Latency is only reported for successful requests, a series without any is marked as failed.
+    """
+    requests = len(samples)
+    successful = [sample for sample, status in zip(samples, statuses) if status < 400]
+
+    codes = {}
+    for status in statuses:
+        codes[str(status)] = codes.get(str(status), 0) + 1
+
+    return {
+        "requests": requests,
+        "status_codes": codes,
+        "failed": not successful,
+        "latency": percentiles(successful),
+        "forks_per_request": forks / requests,
+        "mongo_ops_per_request": ops / requests,
+        "rss": {
+            "portal_peak_kb": portalPeakRSS(),
+            "portal_growth_kb": portalPeakRSS() - rssBefore,
+            "flux_peak_kb": fluxPeakRSS()
+        }
+    }
+
+#########################################
+# ENVIRONMENT
+#########################################
+
+def setupEnvironment(args, workdir):
+    """
+    Put the fake flux on the PATH, point the portal at a temporary directory
+    and replace MongoDB by the in-memory stand-in.
+    """
+    bindir = os.path.join(workdir, "bin")
+    os.makedirs(bindir)
+    fake_flux.install(bindir)
+
+    shared = os.path.join(workdir, "shared")
+    os.makedirs(os.path.join(shared, "bench"))
+    with open(os.path.join(shared, "bench", "input.txt"), "w") as f:
+        f.write("x" * args.output_size)
+
+    os.environ["PATH"] = f"{bindir}{os.pathsep}{os.environ['PATH']}"
+    os.environ["FAKE_FLUX_NODES"] = str(args.nodes)
+    os.environ["FAKE_FLUX_JOBS"] = str(args.jobs)
+    os.environ["FAKE_FLUX_LATENCY"] = str(args.latency)
+    os.environ["FAKE_FLUX_OUTPUT_SIZE"] = str(args.output_size)
+    os.environ["FAKE_FLUX_STATE"] = os.path.join(workdir, "state")
+    os.environ["FAKE_FLUX_CWD"] = os.path.join(shared, "bench")
+
+    server.PWD = shared
+
+    forks = ForkCounter()
+    subprocess.run = forks
+    return forks
+
+def resetState():
+    """
+    Drop the jobs submitted to the fake flux and start from an empty MongoDB.
+    """
+    shutil.rmtree(os.environ["FAKE_FLUX_STATE"], ignore_errors=True)
+    database.db = MemoryDatabase()
+    os.chdir(server.PWD)
+
+def positive(value):
+    """
+    argparse type of an integer of at least 1.
+    """
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"{value} is not a positive integer")
+    return number
+
+def seedWorkflow(client):
+    """
+    Submit one workflow and return its ID.
+    """
+    return client.post("/flux/workflows", json=fake_flux.WORKFLOW).get_json()["id"]
+
+def buildRoutes():
+    """
+    Return the (name, method, url, kwargs) of a request for every route of the portal.
+    kwargs may contain a seed(client) run once before the route is measured, whose
+    result replaces <seed> in the url, and a setup() run before every request.
+    """
+    jobID = 676292747853824
+
+    return [
+        ("drain", "PUT", "/flux/drain", {"json": {"hostname": "node0"}}),
+        ("undrain", "PUT", "/flux/undrain", {"json": {"hostname": "node0"}}),
+        ("nodes", "GET", "/flux/nodes", {}),
+        ("node", "GET", "/flux/nodes/node0", {}),
+        ("submit_job", "POST", "/flux/jobs", {"json": {"jobName": "bench", "jobCommand": "echo bench", "dirName": "bench", "options": {"nodes": 1}}}),
+        ("jobs", "GET", "/flux/jobs", {}),
+        ("job", "GET", f"/flux/jobs/{jobID}", {}),
+        ("cancel_job", "PUT", f"/flux/jobs/{jobID}/cancel", {}),
+        ("job_output", "GET", f"/flux/jobs/{jobID}/output", {}),
+        ("job_download", "GET", f"/flux/jobs/{jobID}/output?download=true", {}),
+        ("tree", "GET", "/flux/tree?dirName=bench", {}),
+        ("upload_files", "POST", "/flux/files?dirName=upload", {"files": True}),
+        ("delete_files", "DELETE", "/flux/files?dirName=upload", {"setup": lambda: os.makedirs(f"{server.PWD}/upload", exist_ok=True)}),
+        ("overlay", "GET", "/flux/overlay", {}),
+        ("submit_workflow", "POST", "/flux/workflows", {"json": fake_flux.WORKFLOW}),
+        ("workflows", "GET", "/flux/workflows", {"seed": seedWorkflow}),
+        ("workflow", "GET", "/flux/workflows/<seed>", {"seed": seedWorkflow})
+    ]
+
+#########################################
+# BENCHMARKS
+#########################################
+
+def benchmarkRoutes(args, forks):
+    """
+    Call every route through the Flask test client and measure latency, forks, Mongo ops and RSS.
+    """
+    client = server.app.test_client()
+    results = {}
+
+    for name, method, url, kwargs in buildRoutes():
+        kwargs = dict(kwargs)
+        setup = kwargs.pop("setup", None)
+        seed = kwargs.pop("seed", None)
+
+        resetState()
+        if seed:
+            url = url.replace("<seed>", str(seed(client)))
+            os.chdir(server.PWD)
+
+        samples = []
+        statuses = []
+        forksBefore = forks.forks
+        opsBefore = database.db.ops
+        rssBefore = portalPeakRSS()
+
+        for _ in range(args.iterations):
+            requestKwargs = dict(kwargs)
+            if setup:
+                setup()
+            if requestKwargs.pop("files", False):
+                requestKwargs["data"] = {"files": (io.BytesIO(b"x" * args.output_size), "bench.txt")}
+                requestKwargs["content_type"] = "multipart/form-data"
+
+            start = time.perf_counter()
+            response = client.open(url, method=method, **requestKwargs)
+            samples.append(time.perf_counter() - start)
+            statuses.append(response.status_code)
+            response.close()
+
+        results[name] = dict(
+            {"method": method, "url": url},
+            **summarize(samples, statuses, forks.forks - forksBefore, database.db.ops - opsBefore, rssBefore)
+        )
+
+    return results
+
+def benchmarkLoad(args, forks):
+    """
+    Run a concurrent HTTP load of the read routes against a local threaded server.
+    """
+    resetState()
+
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+    httpd = make_server("127.0.0.1", 0, server.app, threaded=True)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+
+    base = f"http://127.0.0.1:{httpd.server_port}"
+    urls = [f"{base}{url}" for url in args.load_routes]
+
+    def request(index):
+        start = time.perf_counter()
+        try:
+            with urllib.request.urlopen(urls[index % len(urls)]) as response:
+                response.read()
+                status = response.status
+        except urllib.error.HTTPError as e:
+            status = e.code
+        except Exception:
+            status = 599
+        return time.perf_counter() - start, status
+
+    forksBefore = forks.forks
+    opsBefore = database.db.ops
+    rssBefore = portalPeakRSS()
+    start = time.perf_counter()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        responses = list(executor.map(request, range(args.load_requests)))
+    elapsed = time.perf_counter() - start
+
+    httpd.shutdown()
+    thread.join()
+
+    result = summarize(
+        [sample for sample, _ in responses],
+        [status for _, status in responses],
+        forks.forks - forksBefore,
+        database.db.ops - opsBefore,
+        rssBefore
+    )
+    return dict(
+        {"routes": args.load_routes, "concurrency": args.concurrency, "throughput_rps": round(args.load_requests / elapsed, 3)},
+        **result
+    )
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the Flux Web Portal against a fake flux and an in-memory MongoDB.")
+    parser.add_argument("--nodes", type=int, default=4, help="number of simulated nodes")
+    parser.add_argument("--jobs", type=int, default=100, help="number of simulated jobs")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every flux call")
+    parser.add_argument("--output-size", type=int, default=1024, help="bytes of job output and uploaded files")
+    parser.add_argument("--iterations", type=positive, default=10, help="requests per route")
+    parser.add_argument("--concurrency", type=positive, default=8, help="concurrent clients of the load generator")
+    parser.add_argument("--load-requests", type=int, default=100, help="total requests of the load generator, 0 to skip")
+    parser.add_argument("--load-routes", nargs="+", default=["/flux/nodes", "/flux/jobs", "/flux/jobs/676292747853824"], help="routes requested by the load generator")
+    parser.add_argument("--output", help="write the JSON results to this file instead of stdout")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="flux-bench-")
+    try:
+        forks = setupEnvironment(args, workdir)
+
+        results = {
+            "config": {
+                "nodes": args.nodes,
+                "jobs": args.jobs,
+                "latency": args.latency,
+                "output_size": args.output_size,
+                "iterations": args.iterations,
+                "python": sys.version.split()[0]
+            },
+            "routes": benchmarkRoutes(args, forks),
+            "load": benchmarkLoad(args, forks) if args.load_requests else None
+        }
+    finally:
+        os.chdir(os.path.dirname(workdir))
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    output = json.dumps(results, indent=4)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    else:
+        print(output)
+
+if __name__ == '__main__':
+    main()
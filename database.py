@@ -7,6 +7,9 @@ from bson.objectid import ObjectId
 client = pymongo.MongoClient("mongodb://localhost:27017/")
 db = client["flux_db"]
 
+# Maximum number of job IDs passed to a single `flux jobs` call
+FLUX_JOBS_BATCH = 500
+
 def parse_flux_resource_list_to_json(output):
     """
     Parse the Flux resource list output into a JSON object.
@@ -174,6 +177,117 @@ def get_flux_job(job_id):
     
     return job
 
+def workflow_job_ids(workflow):
+    """
+    Returns the Flux job IDs (decimal) of the submitted steps of a workflow.
+    """
+    return [int(step["jobID"]) for step in workflow.get("steps", []) if step.get("jobID")]
+
+def query_flux_jobs(job_ids):
+    """
+    Query the state of the given jobs directly from Flux, without reloading the whole job list.
+    `flux jobs` only lists a limited number of jobs, so older finished steps would be missing from it.
+    Returns a dict of the jobs by their ID.
+    """
+    jobs = {}
+    for start in range(0, len(job_ids), FLUX_JOBS_BATCH):
+        batch = " ".join(str(job_id) for job_id in job_ids[start:start + FLUX_JOBS_BATCH])
+        result = subprocess.run(f"flux jobs --json {batch}", shell=True, capture_output=True, text=True)
+        if result.stderr:
+            print(f"Error getting jobs: {result.stderr}")
+        if not result.stdout:
+            continue
+        
+        for job in json.loads(result.stdout)["jobs"]:
+            jobs[job["id"]] = job
+    return jobs
+
+def summarize_flux_workflow(workflow, jobs):
+    """
+    Attach the current Flux state of every step to a workflow document.
+    jobs is a dict of the Flux jobs by their ID, as returned by query_flux_jobs.
+    Returns the workflow with per-step states, state counts and an aggregate status.
+    """
+    steps = workflow.get("steps", [])
+
+    # Count the steps per state, using the result of finished jobs instead of INACTIVE
+    counts = {}
+    for step in steps:
+        if step.get("jobID"):
+            job = jobs.get(int(step["jobID"]))
+            step["state"] = "UNKNOWN" if job is None else job.get("result", job.get("state"))
+        elif step.get("error"):
+            step["state"] = "SUBMIT_FAILED"
+        elif step.get("skipped"):
+            step["state"] = "SKIPPED"
+        else:
+            step["state"] = "PENDING_SUBMIT"
+        counts[step["state"]] = counts.get(step["state"], 0) + 1
+
+    active = sum(1 for step in steps if step["state"] in ["PENDING_SUBMIT", "DEPEND", "PRIORITY", "SCHED", "RUN", "CLEANUP"])
+    failed = sum(count for state, count in counts.items() if state not in ["COMPLETED", "UNKNOWN"])
+    if workflow.get("status") == "submit_failed":
+        status = "submit_failed"
+    elif workflow.get("status") == "submitting" or active:
+        status = "running" if counts.get("RUN") or counts.get("CLEANUP") else "pending"
+    elif failed:
+        status = "failed"
+    elif counts.get("UNKNOWN"):
+        # The jobs are no longer known to Flux, their result cannot be told
+        status = "unknown"
+    else:
+        status = "completed"
+
+    workflow["id"] = str(workflow.pop("_id"))
+    workflow["counts"] = counts
+    workflow["status"] = status
+    return workflow
+
+def create_flux_workflow(workflow):
+    """
+    Insert a new workflow into the flux_workflows_collection.
+    Returns the ID of the workflow as a string.
+    """
+    flux_workflows_collection = db["flux_workflows"]
+    result = flux_workflows_collection.insert_one(workflow)
+    return str(result.inserted_id)
+
+def update_flux_workflow(workflow_id, update):
+    """
+    Update the fields of a workflow in the flux_workflows_collection.
+    """
+    flux_workflows_collection = db["flux_workflows"]
+    flux_workflows_collection.update_one({"_id": ObjectId(workflow_id)}, {"$set": update})
+
+def get_all_flux_workflows():
+    """
+    Query all data from the flux_workflows_collection.
+    Returns a list of all workflows with the aggregate status of their steps.
+    """
+    flux_workflows_collection = db["flux_workflows"]
+    workflows = list(flux_workflows_collection.find({}))
+    
+    # Query the jobs of all workflows at once instead of once per workflow
+    job_ids = [job_id for workflow in workflows for job_id in workflow_job_ids(workflow)]
+    jobs = query_flux_jobs(job_ids)
+    return [summarize_flux_workflow(workflow, jobs) for workflow in workflows]
+
+def get_flux_workflow(workflow_id):
+    """
+    Query a specific workflow from the flux_workflows_collection.
+    Returns the workflow with the aggregate status of its steps.
+    """
+    if not ObjectId.is_valid(workflow_id):
+        return None
+    
+    flux_workflows_collection = db["flux_workflows"]
+    workflow = flux_workflows_collection.find_one({"_id": ObjectId(workflow_id)})
+    if workflow is None:
+        return None
+    
+    jobs = query_flux_jobs(workflow_job_ids(workflow))
+    return summarize_flux_workflow(workflow, jobs)
+
 def init_db():
     # Create a collection for the flux nodes
     flux_nodes_collection = db["flux_nodes"]
@@ -183,4 +297,3 @@ def init_db():
     flux_jobs_collection = db["flux_jobs"]
     flux_jobs_collection.create_index([("flux_job", pymongo.ASCENDING)])
     load_flux_jobs(flux_jobs_collection)
-    
\ No newline at end of file
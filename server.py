@@ -13,6 +13,9 @@ import database
 
 PWD = "/mnt/shared/flux"
 
+# Maximum number of workflow steps submitted in parallel
+WORKFLOW_SUBMIT_WORKERS = 8
+
 #########################################
 # UTILITIES FUNCTIONS
 #########################################
@@ -98,9 +101,10 @@ def getSpecificFluxJob(jobID):
         print(f"Error getting job information: {e}")
         return None
     
-def submitFluxJob(jobName, jobCommand, dirName, options):
+def submitFluxJob(jobName, jobCommand, dirName, options, dependencies=None):
     """
     Submit a job to the Flux handle.
+    dependencies is a list of Flux dependency URIs, e.g. ["afterok:<jobID>"].
     """
     try:
         nodes = f"-N {options.get('nodes', 1)}" if options.get('nodes', None) else ""
@@ -115,16 +119,154 @@ def submitFluxJob(jobName, jobCommand, dirName, options):
         gpus_per_task = f"-g {options.get('gpus-per-task', 1)}" if options.get('gpus-per-task', None) else ""
         ntasks = f"-n {options.get('ntasks', 1)}" if options.get('ntasks', None) else ""
         
+        # Job dependencies
+        dependency = " ".join(f"--dependency={d}" for d in dependencies) if dependencies else ""
+        
         os.makedirs(f"{PWD}/{dirName}", exist_ok=True)
-        os.chdir(f"{PWD}/{dirName}")
         
-        result = subprocess.run(f"flux submit --cwd={PWD}/{dirName} --job-name={jobName} {nodes} {cores_per_task} {gpus_per_task} {ntasks} {cores} {tasks_per_node} {tasks_per_core} bash -c \"{jobCommand}\"", shell=True, capture_output=True, text=True)
-        os.chdir(PWD)
+        # Run in the job directory without os.chdir so that workflow steps can be submitted concurrently
+        result = subprocess.run(f"flux submit --cwd={PWD}/{dirName} --job-name={jobName} {dependency} {nodes} {cores_per_task} {gpus_per_task} {ntasks} {cores} {tasks_per_node} {tasks_per_core} bash -c \"{jobCommand}\"", shell=True, capture_output=True, text=True, cwd=f"{PWD}/{dirName}")
         return result.stdout, result.stderr
     except Exception as e:
         print(f"Error submitting job: {e}")
         return None, str(e)
     
+def buildWorkflowLayers(steps):
+    """
+    Sort the steps of a workflow into layers of a DAG.
+    Every step only depends (afterok/afterany) on steps of earlier layers.
+    Raises ValueError if the workflow is not a valid DAG.
+    """
+    if not isinstance(steps, list) or not all(isinstance(step, dict) for step in steps):
+        raise ValueError("Workflow steps must be a list of objects")
+    
+    names = [step.get('name') for step in steps]
+    if not all(isinstance(name, str) for name in names):
+        raise ValueError("Step name is required")
+    if len(set(names)) != len(names):
+        raise ValueError("Step names must be unique")
+    
+    for step in steps:
+        if step.get('jobCommand') is None:
+            raise ValueError(f"Job command is required for step {step['name']}")
+        for edge in ['afterok', 'afterany']:
+            parents = step.get(edge, [])
+            if not isinstance(parents, list) or not all(isinstance(parent, str) for parent in parents):
+                raise ValueError(f"{edge} of step {step['name']} must be a list of step names")
+        for parent in step.get('afterok', []) + step.get('afterany', []):
+            if parent not in names:
+                raise ValueError(f"Step {step['name']} depends on unknown step {parent}")
+    
+    layers = []
+    placed = set()
+    remaining = list(steps)
+    while remaining:
+        layer = [step for step in remaining if set(step.get('afterok', []) + step.get('afterany', [])) <= placed]
+        if not layer:
+            raise ValueError(f"Workflow has a dependency cycle between steps {[step['name'] for step in remaining]}")
+        
+        layers.append(layer)
+        placed.update(step['name'] for step in layer)
+        remaining = [step for step in remaining if step['name'] not in placed]
+        
+    return layers
+
+def submitFluxWorkflowStep(step, dirName, jobIDs):
+    """
+    Submit a single workflow step, mapping its edges onto Flux dependencies.
+    Returns the step with its jobID (decimal), or the submission error,
+    or skipped set if one of its parents could not be submitted.
+    """
+    # A step cannot be submitted if one of its parents was not submitted
+    parents = step.get('afterok', []) + step.get('afterany', [])
+    if any(jobIDs.get(parent) is None for parent in parents):
+        step['skipped'] = True
+        return step
+    
+    dependencies = [f"afterok:{jobIDs[parent]}" for parent in step.get('afterok', [])]
+    dependencies += [f"afterany:{jobIDs[parent]}" for parent in step.get('afterany', [])]
+    
+    stdout, stderr = submitFluxJob(step['name'], step['jobCommand'], step.get('dirName', dirName), step.get('options', {}), dependencies)
+    
+    if stderr or not stdout:
+        step['error'] = stderr
+        return step
+    
+    step['jobID'] = convertF58toDecimal(stdout.rstrip('\n'))
+    return step
+
+def submitFluxWorkflow(workflowName, dirName, steps):
+    """
+    Submit a workflow (DAG of jobs) to the Flux handle.
+    Every layer is submitted in parallel right after its parents are submitted,
+    Flux holds the jobs in DEPEND state until their dependencies are satisfied.
+    The steps are updated in place with their layer, jobID and submission error.
+    Returns the ID of the workflow and its submission status:
+    submitted, partially_submitted or submit_failed.
+    """
+    layers = buildWorkflowLayers(steps)
+    
+    for index, layer in enumerate(layers):
+        for step in layer:
+            step['layer'] = index
+            step['jobID'] = None
+            step['error'] = None
+            step['skipped'] = False
+    
+    workflowID = database.create_flux_workflow({
+        "name": workflowName,
+        "dirName": dirName,
+        "status": "submitting",
+        "t_submit": time.time(),
+        "steps": steps
+    })
+    
+    jobIDs = {}
+    try:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=WORKFLOW_SUBMIT_WORKERS) as executor:
+            for layer in layers:
+                for step in executor.map(lambda step: submitFluxWorkflowStep(step, dirName, jobIDs), layer):
+                    jobIDs[step['name']] = step['jobID']
+                
+                database.update_flux_workflow(workflowID, {"steps": steps})
+    except Exception:
+        # Do not leave the workflow in the submitting state forever
+        database.update_flux_workflow(workflowID, {"status": "submit_failed", "steps": steps})
+        raise
+    
+    submitted = sum(1 for step in steps if step['jobID'])
+    if submitted == len(steps):
+        status = "submitted"
+    elif submitted:
+        status = "partially_submitted"
+    else:
+        status = "submit_failed"
+    
+    database.update_flux_workflow(workflowID, {"status": status})
+    return workflowID, status
+
+def getFluxWorkflows():
+    """
+    Get all workflows with their aggregate status.
+    """
+    try:
+        data = database.get_all_flux_workflows()
+        return data
+    except Exception as e:
+        print(f"Error getting workflows information: {e}")
+        return []
+    
+def getSpecificFluxWorkflow(workflowID):
+    """
+    Get a specific workflow with its aggregate status.
+    """
+    try:
+        data = database.get_flux_workflow(workflowID)
+        return data
+    except Exception as e:
+        print(f"Error getting workflow information: {e}")
+        return None
+    
 def uploadFiles(dirName, files):
     """
     Upload files to the /data directory.
@@ -453,6 +595,103 @@ def getJobOutput(jobID):
     
     return flask.jsonify({"result": {"status": job.get('state'), "stdout": result.stdout, "stderr": result.stderr}}), 200
 
+@app.route('/flux/workflows', methods=['POST'])
+def submitWorkflow():
+    """Submit a workflow (DAG of jobs) to the Flux handle."""
+    """
+    input:
+    {
+        "workflowName": "pipeline-1",
+        "dirName": "pipeline-1",
+        "steps": [
+            {
+                "name": "prepare",
+                "jobCommand": "echo 'prepare'",
+                "options": {"nodes": 1}
+            },
+            {
+                "name": "compute",
+                "jobCommand": "echo 'compute'",
+                "afterok": ["prepare"]
+            },
+            {
+                "name": "cleanup",
+                "jobCommand": "echo 'cleanup'",
+                "afterany": ["compute"]
+            }
+        ]
+    }
+    """
+    
+    workflowName = flask.request.get_json().get('workflowName')
+    if workflowName is None:
+        return flask.jsonify({"error": "Workflow name is required"}), 400
+    
+    dirName = flask.request.get_json().get('dirName')
+    if dirName is None:
+        return flask.jsonify({"error": "Directory name is required"}), 400
+    
+    steps = flask.request.get_json().get('steps')
+    if not steps:
+        return flask.jsonify({"error": "Workflow steps are required"}), 400
+    
+    try:
+        workflowID, status = submitFluxWorkflow(workflowName, dirName, steps)
+    except ValueError as e:
+        return flask.jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return flask.jsonify({"error": str(e)}), 500
+    
+    # Echo the submitted steps, their Flux state is available from GET /flux/workflows/<workflowID>
+    workflow = {"id": workflowID, "name": workflowName, "dirName": dirName, "status": status, "steps": steps}
+    
+    if status != "submitted":
+        errors = {step['name']: step['error'] for step in steps if step['error']}
+        message = "No workflow step was submitted" if status == "submit_failed" else "Some workflow steps were not submitted"
+        return flask.jsonify({"error": message, "errors": errors, "id": workflowID, "workflow": workflow}), 500
+    
+    return flask.jsonify({"message": "Workflow submitted successfully", "id": workflowID, "workflow": workflow}), 200
+
+@app.route('/flux/workflows', methods=['GET'])
+def getWorkflows():
+    """Get all workflows and their aggregate status."""
+    
+    workflows = getFluxWorkflows()
+    
+    return flask.jsonify({"workflows": workflows}), 200
+
+@app.route('/flux/workflows/<workflowID>', methods=['GET'])
+def getWorkflow(workflowID):
+    """Get the aggregate status of a specific workflow."""
+    """
+    output:
+    {
+        "workflow": {
+            "id": "6650c3f2e4b0a1b2c3d4e5f6",
+            "name": "pipeline-1",
+            "status": "running",
+            "counts": {"COMPLETED": 1, "RUN": 1, "DEPEND": 1},
+            "steps": [
+                {
+                    "name": "prepare",
+                    "jobID": "676292747853824",
+                    "layer": 0,
+                    "state": "COMPLETED",
+                    ...
+                },
+                ...
+            ]
+        }
+    }
+    """
+    
+    workflow = getSpecificFluxWorkflow(workflowID)
+    
+    if workflow is None:
+        return flask.jsonify({"error": "Workflow not found"}), 404
+    
+    return flask.jsonify({"workflow": workflow}), 200
+
 @app.route('/flux/tree', methods=['GET'])
 def getJobTree():
     """Get the tree of the cwd of a job."""
@@ -0,0 +1,42 @@
+"""
+Fixtures running the portal against the fake flux scheduler and the in-memory MongoDB
+from the benchmarks directory.
+"""
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+import server
+import database
+import fake_flux
+from memory_mongo import MemoryDatabase
+
+@pytest.fixture
+def state(tmp_path, monkeypatch):
+    """
+    Put the fake flux on the PATH and replace MongoDB by the in-memory stand-in.
+    Returns the state directory of the fake scheduler.
+    """
+    bindir = tmp_path / "bin"
+    bindir.mkdir()
+    fake_flux.install(str(bindir))
+
+    shared = tmp_path / "shared"
+    shared.mkdir()
+
+    monkeypatch.setenv("PATH", f"{bindir}{os.pathsep}{os.environ['PATH']}")
+    monkeypatch.setenv("FAKE_FLUX_JOBS", "0")
+    monkeypatch.setenv("FAKE_FLUX_STATE", str(tmp_path / "state"))
+    monkeypatch.setenv("FAKE_FLUX_CWD", str(shared))
+    monkeypatch.setattr(server, "PWD", str(shared))
+    monkeypatch.setattr(database, "db", MemoryDatabase())
+    return str(tmp_path / "state")
+
+@pytest.fixture
+def client(state):
+    return server.app.test_client()
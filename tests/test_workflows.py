@@ -0,0 +1,185 @@
+"""
+Tests of the workflow (DAG) API against the fake flux scheduler and the in-memory MongoDB.
+"""
+import os
+import json
+
+import pytest
+
+import server
+import database
+import fake_flux
+from fake_flux import WORKFLOW
+
+def submit(client, workflow=WORKFLOW):
+    return client.post("/flux/workflows", json=json.loads(json.dumps(workflow)))
+
+def stepsByName(response):
+    return {step["name"]: step for step in response.get_json()["workflow"]["steps"]}
+
+def test_dependencies_are_passed_to_flux(client, state):
+    response = submit(client)
+    assert response.status_code == 200
+    steps = stepsByName(response)
+
+    def dependencies(name):
+        return fake_flux.read_job(state, steps[name]["jobID"])["dependencies"]
+
+    assert dependencies("prepare") == []
+    assert dependencies("compute-1") == [f"afterok:{steps['prepare']['jobID']}"]
+    assert dependencies("compute-2") == [f"afterok:{steps['prepare']['jobID']}"]
+    assert sorted(dependencies("cleanup")) == sorted([
+        f"afterany:{steps['compute-1']['jobID']}",
+        f"afterany:{steps['compute-2']['jobID']}"
+    ])
+
+def test_layers_are_submitted_in_order(client, state):
+    response = submit(client)
+    steps = stepsByName(response)
+
+    assert {name: step["layer"] for name, step in steps.items()} == {"prepare": 0, "compute-1": 1, "compute-2": 1, "cleanup": 2}
+
+    with open(os.path.join(state, "submit.log")) as f:
+        order = f.read().split()
+    assert order[0] == "prepare"
+    assert sorted(order[1:3]) == ["compute-1", "compute-2"]
+    assert order[3] == "cleanup"
+
+@pytest.mark.parametrize("steps, error", [
+    ([{"name": "a", "jobCommand": "true", "afterok": ["b"]}, {"name": "b", "jobCommand": "true", "afterany": ["a"]}], "cycle"),
+    ([{"name": "a", "jobCommand": "true", "afterok": ["a"]}], "cycle"),
+    ([{"name": "a", "jobCommand": "true", "afterok": ["missing"]}], "unknown step"),
+    ([{"name": "a", "jobCommand": "true"}, {"name": "a", "jobCommand": "true"}], "unique"),
+    ([{"name": "a", "jobCommand": "true"}, {"name": "b", "jobCommand": "true", "afterok": "a"}], "must be a list"),
+    ([{"name": "a", "jobCommand": "true", "afterany": [1]}], "must be a list"),
+    ({"a": 1}, "list of objects"),
+    (["a"], "list of objects"),
+    ([{"jobCommand": "true"}], "name is required"),
+    ([{"name": "a"}], "Job command is required")
+])
+def test_invalid_workflow_is_rejected(client, state, steps, error):
+    response = submit(client, dict(WORKFLOW, steps=steps))
+
+    assert response.status_code == 400
+    assert error in response.get_json()["error"]
+    assert not os.path.exists(os.path.join(state, "submit.log"))
+
+def test_children_are_skipped_when_parent_fails_to_submit(client, state, monkeypatch):
+    monkeypatch.setenv("FAKE_FLUX_FAIL_SUBMIT", "prepare")
+
+    response = submit(client)
+    assert response.status_code == 500
+    assert response.get_json()["error"] == "No workflow step was submitted"
+    assert list(response.get_json()["errors"]) == ["prepare"]
+
+    # No child is submitted to flux
+    assert not os.path.exists(os.path.join(state, "submit.log"))
+
+    workflow = client.get(f"/flux/workflows/{response.get_json()['id']}").get_json()["workflow"]
+    states = {step["name"]: step["state"] for step in workflow["steps"]}
+    assert states == {"prepare": "SUBMIT_FAILED", "compute-1": "SKIPPED", "compute-2": "SKIPPED", "cleanup": "SKIPPED"}
+    assert workflow["status"] == "submit_failed"
+
+def test_partial_submission_is_reported(client, state, monkeypatch):
+    monkeypatch.setenv("FAKE_FLUX_FAIL_SUBMIT", "compute-2")
+
+    response = submit(client)
+    assert response.status_code == 500
+    assert response.get_json()["error"] == "Some workflow steps were not submitted"
+    assert response.get_json()["workflow"]["status"] == "partially_submitted"
+    assert list(response.get_json()["errors"]) == ["compute-2"]
+
+    workflow = client.get(f"/flux/workflows/{response.get_json()['id']}").get_json()["workflow"]
+    states = {step["name"]: step["state"] for step in workflow["steps"]}
+    assert states == {"prepare": "SCHED", "compute-1": "DEPEND", "compute-2": "SUBMIT_FAILED", "cleanup": "SKIPPED"}
+    assert workflow["status"] == "pending"
+
+def test_steps_are_pending_while_submitting(client, monkeypatch):
+    submitFluxWorkflowStep = server.submitFluxWorkflowStep
+    seen = {}
+
+    def submitStep(step, dirName, jobIDs):
+        # Look at the stored workflow while the last layer is being submitted
+        if step["name"] == "cleanup":
+            workflow = database.get_all_flux_workflows()[0]
+            seen.update({step["name"]: step["state"] for step in workflow["steps"]}, status=workflow["status"])
+        return submitFluxWorkflowStep(step, dirName, jobIDs)
+    monkeypatch.setattr(server, "submitFluxWorkflowStep", submitStep)
+
+    assert submit(client).status_code == 200
+    assert seen == {"prepare": "SCHED", "compute-1": "DEPEND", "compute-2": "DEPEND", "cleanup": "PENDING_SUBMIT", "status": "pending"}
+
+def test_status_does_not_depend_on_the_flux_job_list(client, state, monkeypatch):
+    # Older jobs drop out of `flux jobs`, the workflow looks up its own jobs
+    monkeypatch.setenv("FAKE_FLUX_LIST_LIMIT", "1")
+
+    response = submit(client)
+    for step in response.get_json()["workflow"]["steps"]:
+        fake_flux.set_job_state(state, step["jobID"], "INACTIVE", "COMPLETED")
+
+    workflow = client.get(f"/flux/workflows/{response.get_json()['id']}").get_json()["workflow"]
+    assert workflow["status"] == "completed"
+
+def test_workflow_progresses_with_the_scheduler(client, state):
+    response = submit(client)
+    workflowID = response.get_json()["id"]
+    steps = stepsByName(response)
+
+    def status():
+        return client.get(f"/flux/workflows/{workflowID}").get_json()["workflow"]
+
+    assert status()["status"] == "pending"
+    assert status()["counts"] == {"SCHED": 1, "DEPEND": 3}
+
+    fake_flux.set_job_state(state, steps["prepare"]["jobID"], "INACTIVE", "COMPLETED")
+    fake_flux.set_job_state(state, steps["compute-1"]["jobID"], "RUN")
+    assert status()["status"] == "running"
+
+    fake_flux.set_job_state(state, steps["compute-1"]["jobID"], "INACTIVE", "COMPLETED")
+    fake_flux.set_job_state(state, steps["compute-2"]["jobID"], "INACTIVE", "COMPLETED")
+    fake_flux.set_job_state(state, steps["cleanup"]["jobID"], "INACTIVE", "COMPLETED")
+    assert status()["status"] == "completed"
+
+def test_afterok_failure_fails_the_workflow(client, state):
+    response = submit(client)
+    workflowID = response.get_json()["id"]
+    steps = stepsByName(response)
+
+    fake_flux.set_job_state(state, steps["prepare"]["jobID"], "INACTIVE", "FAILED")
+
+    workflow = client.get(f"/flux/workflows/{workflowID}").get_json()["workflow"]
+    states = {step["name"]: step["state"] for step in workflow["steps"]}
+    assert states == {"prepare": "FAILED", "compute-1": "FAILED", "compute-2": "FAILED", "cleanup": "SCHED"}
+    assert workflow["status"] == "pending"
+
+def test_submit_error_stores_terminal_status(client, monkeypatch):
+    def fail(step, dirName, jobIDs):
+        raise RuntimeError("flux is gone")
+    monkeypatch.setattr(server, "submitFluxWorkflowStep", fail)
+
+    response = submit(client)
+    assert response.status_code == 500
+
+    workflows = client.get("/flux/workflows").get_json()["workflows"]
+    assert [workflow["status"] for workflow in workflows] == ["submit_failed"]
+
+@pytest.mark.parametrize("stored, jobs, status", [
+    ("submitting", [], "pending"),
+    ("submitted", [{"state": "SCHED"}, {"state": "DEPEND"}], "pending"),
+    ("submitted", [{"state": "INACTIVE", "result": "COMPLETED"}, {"state": "RUN"}], "running"),
+    ("submitted", [{"state": "INACTIVE", "result": "COMPLETED"}, {"state": "INACTIVE", "result": "COMPLETED"}], "completed"),
+    ("submitted", [{"state": "INACTIVE", "result": "COMPLETED"}, {"state": "INACTIVE", "result": "FAILED"}], "failed"),
+    ("submitted", [{"state": "INACTIVE", "result": "CANCELED"}, {"state": "DEPEND"}], "pending"),
+    ("submitted", [{"state": "INACTIVE", "result": "COMPLETED"}, None], "unknown"),
+    ("submitted", [{"state": "INACTIVE", "result": "FAILED"}, None], "failed"),
+    ("submit_failed", [{"state": "INACTIVE", "result": "COMPLETED"}], "submit_failed")
+])
+def test_summarize_flux_workflow_status(stored, jobs, status):
+    steps = [{"name": f"step-{i}", "jobID": str(i + 1)} for i in range(len(jobs))] or [{"name": "step", "jobID": None, "error": None}]
+    jobs = {i + 1: dict(job, id=i + 1) for i, job in enumerate(jobs) if job is not None}
+    workflow = {"_id": "workflow", "status": stored, "steps": steps}
+
+    summary = database.summarize_flux_workflow(workflow, jobs)
+
+    assert summary["status"] == status
+    assert sum(summary["counts"].values()) == len(summary["steps"])